@@ -8,20 +8,36 @@ Copyright (c) 2025 apktool mcp server developer(s) (https://github.com/zinja-cod
 See the file 'LICENSE' for copying permission
 """
 
+import asyncio
+import atexit
+import functools
+import hashlib
+import itertools
 import logging
-import subprocess
+import mmap
 import os
+import re
+import shlex
 import shutil
+import subprocess
+import tempfile
+import time
+import zipfile
 
-from typing import List, Union, Dict, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Union, Dict, Optional, Tuple
 
 from mcp.server.fastmcp import FastMCP
 from supabase_integration import init_supabase, log_result
 from functools import wraps
 
 # set up logging configuration
-logger = logging.getLogger()
+# A named logger (rather than the root one) so embedding apps don't get duplicate lines;
+# supabase_integration logs through its "apktool_mcp_server.supabase" child logger
+logger = logging.getLogger("apktool_mcp_server")
 logger.setLevel(logging.INFO)
+logger.propagate = False
 
 # Console handler for logging to the console
 console_handler = logging.StreamHandler()
@@ -36,20 +52,60 @@ mcp = FastMCP("APKTool-MCP Server")
 WORKSPACE_DIR = os.environ.get("APKTOOL_WORKSPACE", os.path.join("apktool_mcp_server_workspace"))
 
 # Ensure workspace directory exists
-os.makedirs(WORKSPACE_DIR, exist_ok=True)
+try:
+    os.makedirs(WORKSPACE_DIR, exist_ok=True)
+except OSError as e:
+    logger.error(f"Failed to create workspace directory {WORKSPACE_DIR}: {str(e)}")
+
+# Number of trailing stdout/stderr lines, and at most how many bytes of them, kept from each command
+OUTPUT_TAIL_LINES = 1000
+OUTPUT_TAIL_BYTES = 64 << 10
+
+# Buffer limit of the subprocess stream readers (also the longest line read in one go)
+STREAM_LIMIT = 1 << 20
+
+# Number of threads reading files in search_in_files
+SEARCH_WORKERS = int(os.environ.get("APKTOOL_SEARCH_WORKERS", min(32, (os.cpu_count() or 1) * 4)))
+
+# Files larger than this are decoded straight from a memory map instead of read() first
+MMAP_READ_THRESHOLD = 1 << 20
+
+# Text files up to this size are kept in the read cache of the get_* tools
+READ_CACHE_MAX_FILE_SIZE = 1 << 18
+
+# Marker written into a decoded project recording which APK and flags produced it
+DECODE_STAMP_FILE = ".apktool_mcp_decode"
+
+# Optional Nailgun server keeping one apktool JVM warm across calls (APKTOOL_NAILGUN=1)
+NAILGUN_ENABLED = os.environ.get("APKTOOL_NAILGUN", "0") == "1"
+NAILGUN_CLIENT = os.environ.get("NAILGUN_CLIENT", "ng")
+NAILGUN_SERVER_JAR = os.environ.get("NAILGUN_SERVER_JAR")
+APKTOOL_JAR = os.environ.get("APKTOOL_JAR")
+APKTOOL_MAIN_CLASS = "brut.apktool.Main"
+# Exit codes of the Nailgun client when it cannot reach the server or loses the connection
+NAILGUN_CONNECTION_ERRORS = (227, 230, 231)
+
+# Nailgun server started by this process (if any) and the resolved apktool invocation
+_nailgun_proc: Optional[subprocess.Popen] = None
+_apktool_prefix: Optional[List[str]] = None
+_apktool_prefix_lock = asyncio.Lock()
 
 # Initialize Supabase client if credentials are provided
-init_supabase()
+supabase_client = init_supabase()
 
 
 def supabase_logger(func):
     """Decorator to log tool results to Supabase."""
+    if supabase_client is None:
+        # Logging is off for the life of the process, so leave the tool unwrapped
+        return func
+    param_names = func.__code__.co_varnames[:func.__code__.co_argcount]
+
     @wraps(func)
     async def wrapper(*args, **kwargs):
         result = await func(*args, **kwargs)
         try:
-            param_names = func.__code__.co_varnames[:func.__code__.co_argcount]
-            params = {name: val for name, val in zip(param_names, args)}
+            params = dict(zip(param_names, args))
             params.update(kwargs)
             log_result(func.__name__, params, result)
         except Exception as e:
@@ -60,40 +116,437 @@ def supabase_logger(func):
 
 
 
+# Helper function to stop a child process without leaving a zombie behind
+async def stop_process(proc: asyncio.subprocess.Process, grace: float = 5) -> None:
+    if proc.returncode is not None:
+        return
+    try:
+        proc.terminate()
+        await asyncio.wait_for(proc.wait(), timeout=grace)
+    except ProcessLookupError:
+        pass
+    except asyncio.TimeoutError:
+        logger.warning(f"Process {proc.pid} ignored SIGTERM, killing it")
+        proc.kill()
+        await proc.wait()
+
+# Helper function to hash a file without loading it into memory at once.
+# Digests are memoized by (path, mtime, size) so re-decoding an unchanged APK doesn't re-hash it.
+def hash_file(path: str) -> str:
+    st = os.stat(path)
+    return hash_file_cached(path, st.st_mtime_ns, st.st_size)
+
+@functools.lru_cache(maxsize=64)
+def hash_file_cached(path: str, mtime_ns: int, size: int, chunk_size: int = 1 << 20) -> str:
+    with open(path, 'rb') as f:
+        if hasattr(hashlib, "file_digest"):
+            # Python 3.11+: hashes straight from the file buffer with the GIL released
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+# Helper function to cheaply check that a file is an APK before paying for a JVM start
+def validate_apk(apk_path: str) -> Optional[str]:
+    try:
+        with zipfile.ZipFile(apk_path) as z:
+            z.getinfo("AndroidManifest.xml")
+    except zipfile.BadZipFile as e:
+        return f"Not a valid APK (bad zip file): {str(e)}"
+    except KeyError:
+        return "Not a valid APK: AndroidManifest.xml is missing"
+    return None
+
+# Helper function to recursively yield the non-directory entries below a directory
+def iter_files(root_dir: str):
+    stack = [root_dir]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                else:
+                    yield entry
+
+# Helper function collecting the .smali files under a directory, walking its top-level subtrees in parallel
+def find_smali_files(root_dir: str) -> List[str]:
+    paths = []
+    subdirs = []
+    with os.scandir(root_dir) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.name.endswith(".smali"):
+                paths.append(entry.path)
+
+    def walk(dir_path: str) -> List[str]:
+        return [entry.path for entry in iter_files(dir_path) if entry.name.endswith(".smali")]
+
+    if len(subdirs) <= 1:
+        for dir_path in subdirs:
+            paths.extend(walk(dir_path))
+        return paths
+    with ThreadPoolExecutor(max_workers=min(SEARCH_WORKERS, len(subdirs))) as executor:
+        for sub_paths in executor.map(walk, subdirs):
+            paths.extend(sub_paths)
+    return paths
+
+# Helper function listing a project's smali directories (smali, smali_classes2, ...),
+# re-scanned only when the project directory's mtime changes
+def list_smali_dirs(project_dir: str) -> List[str]:
+    return list(scan_smali_dirs(project_dir, os.stat(project_dir).st_mtime_ns))
+
+@functools.lru_cache(maxsize=32)
+def scan_smali_dirs(project_dir: str, mtime_ns: int) -> Tuple[str, ...]:
+    with os.scandir(project_dir) as it:
+        return tuple(sorted(e.name for e in it
+                            if e.name.startswith("smali") and e.is_dir(follow_symlinks=False)))
+
+# Helper function mapping every class of a project to its (file_path, smali_dir).
+# Not invalidated on purpose: callers verify hits and fall back to probing the
+# smali directories, which also finds classes added after the index was built.
+@functools.lru_cache(maxsize=8)
+def smali_class_index(project_dir: str) -> Dict[str, Tuple[str, str]]:
+    index = {}
+    smali_dirs = list_smali_dirs(project_dir)
+    for smali_dir in smali_dirs:
+        smali_path = os.path.join(project_dir, smali_dir)
+        prefix_len = len(os.path.join(smali_path, ""))
+        for entry in iter_files(smali_path):
+            if entry.name.endswith(".smali"):
+                class_name = entry.path[prefix_len:-len(".smali")].replace(os.path.sep, '.')
+                index.setdefault(class_name, (entry.path, smali_dir))
+    return index
+
+# Helper function to match a literal UTF-8 needle against a buffer, or a compiled str regex against decoded text
+def buffer_contains(buf, needle: Union[bytes, re.Pattern]) -> bool:
+    if isinstance(needle, re.Pattern):
+        return needle.search(buf) is not None
+    return buf.find(needle) != -1
+
+# Helper function to check whether a file contains a UTF-8 encoded pattern or matches a str regex
+def file_contains(file_path: str, needle: Union[bytes, re.Pattern]) -> bool:
+    # A regex keeps its Unicode semantics (\w, ., classes) only when run on decoded text;
+    # a literal needle is found in the raw bytes first and only decoded on a hit
+    match_text = isinstance(needle, re.Pattern)
+    try:
+        # Unbuffered, so a small file costs exactly open + fstat + one read + close
+        with open(file_path, 'rb', buffering=0) as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return buffer_contains("" if match_text else b"", needle)
+            if size <= MMAP_READ_THRESHOLD:
+                data = f.read(size)
+                if match_text:
+                    return buffer_contains(data.decode("utf-8"), needle)
+                if not buffer_contains(data, needle):
+                    return False
+                # Skip binary files, as a text-mode search would have
+                data.decode("utf-8")
+                return True
+            # Search the page cache directly instead of copying a large file into memory
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if match_text:
+                    return buffer_contains(str(mm, "utf-8"), needle)
+                if not buffer_contains(mm, needle):
+                    return False
+                str(mm, "utf-8")
+        return True
+    except UnicodeDecodeError:
+        return False
+    except Exception as e:
+        logger.error(f"Error reading file {file_path}: {str(e)}")
+        return False
+
+# Helper function backing search_in_files: walk the project, then grep candidates on a thread pool
+def search_files(project_dir: str, needle: Union[bytes, re.Pattern], file_extensions: List[str], max_results: int) -> List[Dict]:
+    results = []
+    if max_results <= 0:
+        return results
+
+    prefix_len = len(os.path.join(project_dir, ""))
+    # str.endswith takes a tuple and checks every suffix in C
+    extensions = tuple(file_extensions)
+    # Walk lazily and grep in batches, so the rest of the tree is never listed once enough hits are found
+    candidates = (entry.path for entry in iter_files(project_dir)
+                  if entry.name.endswith(extensions))
+
+    with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as executor:
+        while len(results) < max_results:
+            batch = list(itertools.islice(candidates, SEARCH_WORKERS * 8))
+            if not batch:
+                break
+            hits = executor.map(lambda path: file_contains(path, needle), batch)
+            for file_path, hit in zip(batch, hits):
+                if hit:
+                    results.append({
+                        "file": file_path[prefix_len:],
+                        "path": file_path
+                    })
+                    if len(results) >= max_results:
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        break
+    return results
+
+# Helper function to count the regular files directly inside a directory
+def count_files(dir_path: str) -> int:
+    with os.scandir(dir_path) as it:
+        return sum(1 for entry in it if entry.is_file())
+
+# Helper functions to list the resource type directories of a project and the files of one type
+def list_resource_type_names(res_path: str) -> List[str]:
+    with os.scandir(res_path) as it:
+        return [e.name for e in it if e.is_dir()]
+
+def list_resource_types(res_path: str) -> List[Dict]:
+    with os.scandir(res_path) as it:
+        return [{"type": e.name, "path": e.path, "count": count_files(e.path)} for e in it if e.is_dir()]
+
+def list_resource_files(type_path: str) -> List[Dict]:
+    with os.scandir(type_path) as it:
+        return [{"name": e.name, "path": e.path, "size": e.stat().st_size} for e in it if e.is_file()]
+
+# Helper function to probe every smali directory for a class file, returning the directories searched and the match
+def find_smali_class_file(project_dir: str, class_name: str) -> Tuple[List[str], Optional[str]]:
+    smali_dirs = list_smali_dirs(project_dir)
+    class_file = class_name.replace('.', os.sep) + '.smali'
+    for smali_dir in smali_dirs:
+        test_path = f"{project_dir}{os.sep}{smali_dir}{os.sep}{class_file}"
+        if os.path.isfile(test_path):
+            return smali_dirs, test_path
+    return smali_dirs, None
+
+# Helper function to check whether a file already holds exactly the given bytes
+def file_has_content(file_path: str, data: bytes) -> bool:
+    try:
+        # Different sizes can't match, so only read the file when they agree
+        if os.stat(file_path).st_size != len(data):
+            return False
+        with open(file_path, 'rb') as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+# Helper function to copy a file with its metadata, in-kernel (possibly as a reflink) where supported
+def copy_file(src: str, dst: str) -> None:
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                while os.copy_file_range(fsrc.fileno(), fdst.fileno(), 1 << 30):
+                    pass
+            shutil.copystat(src, dst)
+            return
+        except OSError:
+            # e.g. EXDEV/ENOSYS on older kernels or some filesystems; copy2 raises real errors
+            pass
+    shutil.copy2(src, dst)
+
+# Helper function to snapshot a file before it is modified. A hard link is enough because
+# write_file_atomic replaces the file with a new inode, leaving the linked original untouched.
+def backup_file(src: str, dst: str) -> None:
+    try:
+        os.unlink(dst)
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(src, dst)
+    except OSError:
+        # e.g. a filesystem without hard links
+        copy_file(src, dst)
+
+# Helper function to replace a file's contents atomically via a temp file in the same directory
+def write_file_atomic(file_path: str, data: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(prefix=".mod_", dir=os.path.dirname(file_path))
+    try:
+        with os.fdopen(fd, 'wb', buffering=1 << 20) as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file 0600; keep the original file's permissions
+        shutil.copymode(file_path, tmp_path)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+# Helper function to read a whole text file, meant to be run via asyncio.to_thread
+def read_text_file(path: str) -> str:
+    with open(path, 'r', encoding="utf-8") as f:
+        return f.read()
+
+# Helper function to read a resource as UTF-8 in one decode, mapping large files
+def read_resource_text(path: str) -> str:
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return ""
+        if size > MMAP_READ_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                text = str(mm, "utf-8")
+        else:
+            text = f.read().decode("utf-8")
+    # Translate newlines like the text-mode reads of the other get_* tools
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+# Helper function to read a text file, memoized until the file is replaced or its mtime/size change.
+# modify_* tools replace files with a new inode, so their writes always miss the cache.
+def read_text_file_cached(path: str, reader: Callable[[str], str] = read_text_file,
+                          st: Optional[os.stat_result] = None) -> str:
+    if st is None:
+        st = os.stat(path)
+    if st.st_size > READ_CACHE_MAX_FILE_SIZE:
+        return reader(path)
+    return read_text_file_versioned(path, reader, st.st_mtime_ns, st.st_size, st.st_ino)
+
+@functools.lru_cache(maxsize=256)
+def read_text_file_versioned(path: str, reader: Callable[[str], str], mtime_ns: int, size: int, ino: int) -> str:
+    return reader(path)
+
+# Helper function to read a text file, or None if there is no regular file at the path
+def read_text_file_if_exists(path: str) -> Optional[str]:
+    try:
+        return read_text_file_cached(path)
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+        return None
+
+# Helper functions to read/write the decode cache key of a project directory
+def read_decode_stamp(project_dir: str) -> Optional[str]:
+    try:
+        with open(os.path.join(project_dir, DECODE_STAMP_FILE), 'r', encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def write_decode_stamp(project_dir: str, cache_key: str) -> None:
+    with open(os.path.join(project_dir, DECODE_STAMP_FILE), 'w', encoding="utf-8") as f:
+        f.write(cache_key)
+
+def clear_decode_stamp(project_dir: str) -> None:
+    try:
+        os.unlink(os.path.join(project_dir, DECODE_STAMP_FILE))
+    except FileNotFoundError:
+        pass
+
+# Renders a command for log messages only if the record is actually emitted
+class CommandLine:
+    __slots__ = ("command",)
+
+    def __init__(self, command: List[str]):
+        self.command = command
+
+    def __str__(self) -> str:
+        return shlex.join(self.command)
+
+# Helper function to log a subprocess stream line by line, keeping only its tail
+async def read_stream_tail(stream: asyncio.StreamReader, label: str, max_lines: int = OUTPUT_TAIL_LINES,
+                           max_bytes: int = OUTPUT_TAIL_BYTES) -> str:
+    tail = deque(maxlen=max_lines)
+    tail_bytes = 0
+    log_lines = logger.isEnabledFor(logging.INFO)
+    split_line = False
+    while True:
+        try:
+            line = await stream.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            # Last line without a trailing newline, or EOF
+            line = e.partial
+        except asyncio.LimitOverrunError as e:
+            # Line longer than the stream limit: it is still buffered, so take it in pieces
+            line = await stream.read(e.consumed)
+            split_line = True
+        else:
+            if split_line:
+                split_line = False
+                if line in (b"\n", b"\r\n"):
+                    # Just the terminator of a line already taken in pieces
+                    continue
+        if not line:
+            break
+        line = line.rstrip(b"\r\n")
+        if log_lines:
+            logger.info("[%s] %s", label, line.decode("utf-8", errors="replace"))
+        # Bound the tail by size too, so a few huge lines can't pin megabytes each:
+        # keep only the last max_bytes, trimming the oldest retained line to fit
+        line = line[-max_bytes:]
+        if len(tail) == max_lines:
+            tail_bytes -= len(tail[0])
+        tail.append(line)
+        tail_bytes += len(line)
+        while tail_bytes > max_bytes:
+            excess = tail_bytes - max_bytes
+            if len(tail[0]) > excess:
+                tail[0] = tail[0][excess:]
+                tail_bytes -= excess
+            else:
+                tail_bytes -= len(tail.popleft())
+    # Decode only the retained tail, once
+    return b"\n".join(tail).decode("utf-8", errors="replace")
+
+# Helper function to compute the decode cache key of an APK and check it against a project directory
+def check_decode_cache(apk_path: str, output_dir: str, flags: str) -> Tuple[str, bool]:
+    cache_key = f"{hash_file(apk_path)}:{flags}"
+    hit = (read_decode_stamp(output_dir) == cache_key
+           and os.path.isfile(os.path.join(output_dir, "apktool.yml")))
+    return cache_key, hit
+
 # Helper function to run APKTool commands
-def run_command(command: List[str], timeout: int = 300) -> Dict[str, Union[str, int, bool]]:
+async def run_command(command: List[str], timeout: int = 300) -> Dict[str, Union[str, int, bool]]:
+    proc = None
     try:
-        logger.info(f"Running command: {' '.join(command)}")
-        result = subprocess.run(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            check=True,
-            timeout=timeout
+        logger.info("Running command: %s", CommandLine(command))
+        proc = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=STREAM_LIMIT
         )
-        logger.info(f"Command completed with return code {result.returncode}")
+        label = os.path.basename(command[0])
+        readers = asyncio.gather(
+            read_stream_tail(proc.stdout, label),
+            read_stream_tail(proc.stderr, label),
+            proc.wait()
+        )
+        # Retrieve the outcome even when wait_for cancels the gather, so asyncio never reports it as unretrieved
+        readers.add_done_callback(lambda f: f.cancelled() or f.exception())
+        stdout, stderr, _ = await asyncio.wait_for(readers, timeout=timeout)
+
+        if proc.returncode != 0:
+            logger.error(f"Command failed with return code {proc.returncode}: {stderr}")
+            return {
+                "success": False,
+                "stdout": stdout,
+                "stderr": stderr,
+                "returncode": proc.returncode,
+                "error": f"Command failed with return code {proc.returncode}"
+            }
+
+        logger.info("Command completed with return code %d", proc.returncode)
         return {
             "success": True,
-            "stdout": result.stdout,
-            "stderr": result.stderr,
-            "returncode": result.returncode
+            "stdout": stdout,
+            "stderr": stderr,
+            "returncode": proc.returncode
         }
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Command failed with return code {e.returncode}: {e.stderr}")
-        return {
-            "success": False,
-            "stdout": e.stdout,
-            "stderr": e.stderr,
-            "returncode": e.returncode,
-            "error": f"Command failed with return code {e.returncode}"
-        }
-    except subprocess.TimeoutExpired as e:
+    except asyncio.TimeoutError:
         logger.error(f"Command timed out after {timeout} seconds")
+        await stop_process(proc)
         return {
             "success": False,
+            "returncode": None,
+            "timed_out": True,
             "error": f"Command timed out after {timeout} seconds"
         }
+    except asyncio.CancelledError:
+        # The calling task was cancelled (e.g. fail-fast batch), don't orphan apktool
+        if proc is not None:
+            await stop_process(proc)
+        raise
     except Exception as e:
         logger.error(f"Error running command: {str(e)}")
         return {
@@ -102,50 +555,263 @@ def run_command(command: List[str], timeout: int = 300) -> Dict[str, Union[str,
         }
     
 
+# Helper functions to manage the optional Nailgun server
+async def nailgun_alive() -> bool:
+    # Ask apktool itself, since ng-version also succeeds against a server without the apktool jar
+    result = await run_command([NAILGUN_CLIENT, APKTOOL_MAIN_CLASS, "--version"], timeout=5)
+    return result["success"]
+
+def stop_nailgun() -> None:
+    if _nailgun_proc is not None and _nailgun_proc.poll() is None:
+        _nailgun_proc.terminate()
+        try:
+            _nailgun_proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            _nailgun_proc.kill()
+
+async def java_major_version() -> Optional[int]:
+    result = await run_command(["java", "-version"], timeout=30)
+    match = re.search(r'version "(\d+)(?:\.(\d+))?', result.get("stderr", ""))
+    if not match:
+        return None
+    major = int(match.group(1))
+    # Java 8 and older report themselves as 1.x
+    return int(match.group(2) or 0) if major == 1 else major
+
+async def start_nailgun() -> bool:
+    global _nailgun_proc
+    if not (NAILGUN_SERVER_JAR and APKTOOL_JAR):
+        logger.warning("Nailgun server is not running and NAILGUN_SERVER_JAR/APKTOOL_JAR are not set")
+        return False
+
+    classpath = os.pathsep.join([NAILGUN_SERVER_JAR, APKTOOL_JAR])
+    # NGServer installs a SecurityManager to trap System.exit, which JDK 18+ refuses unless
+    # explicitly allowed; JDK 11 and older don't know the "allow" value and would fail on it
+    java_version = await java_major_version()
+    jvm_flags = ["-Djava.security.manager=allow"] if java_version is None or java_version >= 12 else []
+    try:
+        _nailgun_proc = subprocess.Popen(
+            ["java", *jvm_flags, "-cp", classpath, "com.facebook.nailgun.NGServer"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+    except OSError as e:
+        logger.error(f"Failed to start Nailgun server: {str(e)}")
+        return False
+    atexit.register(stop_nailgun)
+
+    # Give the JVM a few seconds to start listening
+    for _ in range(20):
+        await asyncio.sleep(0.5)
+        if await nailgun_alive():
+            logger.info("Nailgun server started")
+            return True
+
+    stop_nailgun()
+    return False
+
+# Helper function to resolve how apktool is invoked: through Nailgun when enabled and reachable, else the launcher
+async def apktool_command() -> List[str]:
+    global _apktool_prefix
+    if _apktool_prefix is None:
+        async with _apktool_prefix_lock:
+            if _apktool_prefix is None:
+                prefix = ["apktool"]
+                if NAILGUN_ENABLED:
+                    if await nailgun_alive() or await start_nailgun():
+                        prefix = [NAILGUN_CLIENT, APKTOOL_MAIN_CLASS]
+                    else:
+                        logger.warning("Nailgun unavailable, falling back to the apktool launcher")
+                _apktool_prefix = prefix
+    return _apktool_prefix
+
+# Helper function to run apktool, retrying with the launcher if the Nailgun server has gone away.
+# stale_dir is removed before the retry so a decode cut off mid-write doesn't leave partial output behind.
+async def run_apktool(args: List[str], timeout: int = 300, stale_dir: Optional[str] = None) -> Dict[str, Union[str, int, bool]]:
+    global _apktool_prefix
+    prefix = await apktool_command()
+    result = await run_command([*prefix, *args], timeout=timeout)
+    if prefix[0] != NAILGUN_CLIENT or result.get("returncode") not in NAILGUN_CONNECTION_ERRORS:
+        return result
+
+    logger.warning("Lost the Nailgun server, retrying with the apktool launcher")
+    # Probe again on the next call, which may start a fresh server
+    _apktool_prefix = None
+    if stale_dir:
+        await asyncio.to_thread(shutil.rmtree, stale_dir, ignore_errors=True)
+    return await run_command(["apktool", *args], timeout=timeout)
+
 # MCP Tools
 
 @mcp.tool(name="decode_apk", description="Decode an APK file using APKTool")
 @supabase_logger
-async def decode_apk(apk_path: str, force: bool = True, no_res: bool = False, no_src: bool = False) -> Dict:
+async def decode_apk(apk_path: str, force: bool = True, no_res: bool = False, no_src: bool = False, only_manifest: bool = False, timeout: int = 300, use_cache: bool = True) -> Dict:
     """
     Decode an APK file using APKTool, extracting resources and smali code.
 
     Args:
         apk_path: Path to the APK file to decode
-        force: Force delete destination directory if it exists
+        force: Force delete destination directory if it exists (not done when use_cache reuses it)
         no_res: Do not decode resources
         no_src: Do not decode sources
+        only_manifest: Only decode AndroidManifest.xml, skipping smali, resources and assets
+        timeout: Seconds to wait for apktool before terminating it (under Nailgun only the ng client is terminated and the decode keeps running in the server)
+        use_cache: Reuse the existing output directory if it was decoded from the same APK content with the same options. Only modify_smali_file and modify_resource_file invalidate it; after editing or deleting files any other way, pass use_cache=False to get a fresh decode
     
     Returns:
         Dictionary with operation results
     """
 
-    if not os.path.exists(apk_path):
+    # Filesystem checks run off the event loop so slow mounts don't stall other tool calls
+    if not await asyncio.to_thread(os.path.isfile, apk_path):
         return {"success": False, "error": f"APK file not found: {apk_path}"}
+
+    try:
+        invalid = await asyncio.to_thread(validate_apk, apk_path)
+    except OSError as e:
+        invalid = f"Failed to read APK: {str(e)}"
+    if invalid:
+        return {"success": False, "error": invalid}
     
     # If output directory not specified, use the APK filename in workspace
-    apk_name = os.path.basename(apk_path).rsplit('.',1)[0]
+    apk_name = os.path.splitext(os.path.basename(apk_path))[0]
     output_dir = os.path.join(WORKSPACE_DIR, apk_name)
 
-    command = ["apktool", "d", apk_path, "-o", output_dir]
+    decoded = {"success": True, "output_dir": output_dir}
+    if only_manifest:
+        decoded["manifest_path"] = os.path.join(output_dir, "AndroidManifest.xml")
 
-    if force:
-        command.append("-f")
-    if no_res:
-        command.append("-r")
-    if no_src:
-        command.append("-s")
+    cache_key = None
+    if use_cache:
+        try:
+            flags = f"{int(no_res)}{int(no_src)}{int(only_manifest)}"
+            cache_key, hit = await asyncio.to_thread(check_decode_cache, apk_path, output_dir, flags)
+            if hit:
+                logger.info("Reusing cached decode of %s in %s", apk_path, output_dir)
+                return {**decoded, "cached": True}
+        except OSError as e:
+            logger.warning(f"Decode cache lookup failed for {apk_path}: {str(e)}")
+
+    # Clear a stale output directory ourselves, off the event loop, instead of passing -f;
+    # when nothing is there yet there is nothing for apktool to delete either
+    if force and await asyncio.to_thread(os.path.isdir, output_dir):
+        try:
+            await asyncio.to_thread(shutil.rmtree, output_dir)
+        except OSError as e:
+            logger.error(f"Error removing stale output directory {output_dir}: {str(e)}")
+            return {
+                "success": False,
+                "error": f"Failed to remove existing output directory: {str(e)}"
+            }
+
+    # Absolute paths, since a reused Nailgun JVM resolves relative ones against its own working directory
+    command = ["d", os.path.abspath(apk_path), "-o", os.path.abspath(output_dir)]
+
+    if only_manifest:
+        # Skip baksmali and resources.arsc, but still decode the binary manifest
+        command.extend(["-r", "-s", "--force-manifest", "--no-assets"])
+    else:
+        if no_res:
+            command.append("-r")
+        if no_src:
+            command.append("-s")
     
-    result = run_command(command)
+    result = await run_apktool(command, timeout=timeout, stale_dir=output_dir if force else None)
 
     if result["success"]:
-        return {
-            "success": True,
-            "output_dir": output_dir
-        }
+        if cache_key:
+            try:
+                await asyncio.to_thread(write_decode_stamp, output_dir, cache_key)
+            except OSError as e:
+                logger.warning(f"Failed to record decode cache key in {output_dir}: {str(e)}")
+        return decoded
     else:
         return result
 
+@mcp.tool(name="decode_apks_batch", description="Decode multiple APK files concurrently using APKTool")
+@supabase_logger
+async def decode_apks_batch(apk_paths: List[str], max_concurrency: Optional[int] = None, force: bool = True, no_res: bool = False, no_src: bool = False, timeout: int = 300, fail_fast: bool = False) -> Dict:
+    """
+    Decode multiple APK files concurrently using APKTool.
+
+    Args:
+        apk_paths: List of paths to the APK files to decode; a repeated path is decoded once, and a different APK with an already listed file name is rejected
+        max_concurrency: Maximum number of apktool processes running at once (defaults to CPU count)
+        force: Force delete destination directory if it exists (not done when it holds a cached decode of the same APK with the same options)
+        no_res: Do not decode resources
+        no_src: Do not decode sources
+        timeout: Seconds to wait for each apktool invocation before terminating it (under Nailgun only the ng client is terminated and the decode keeps running in the server)
+        fail_fast: Cancel the remaining decodes as soon as one of them fails (under Nailgun, decodes already running keep going in the server)
+
+    Returns:
+        Dictionary with per-APK results, in the same order as apk_paths
+    """
+
+    if not max_concurrency or max_concurrency < 1:
+        max_concurrency = os.cpu_count() or 1
+
+    sem = asyncio.Semaphore(max_concurrency)
+
+    async def _one(index: int, apk_path: str):
+        async with sem:
+            return index, await decode_apk(apk_path, force=force, no_res=no_res, no_src=no_src, timeout=timeout)
+
+    # Every APK decodes into WORKSPACE_DIR/<file name>, so decode a path listed twice only once
+    # and reject other APKs whose name would point them at a directory already in use
+    results = [None] * len(apk_paths)
+    first_index = {}
+    dir_owner = {}
+    for i, path in enumerate(apk_paths):
+        real_path = os.path.abspath(path)
+        apk_name = os.path.splitext(os.path.basename(path))[0]
+        owner = dir_owner.setdefault(apk_name, real_path)
+        if owner != real_path:
+            results[i] = {
+                "success": False,
+                "error": f"Output directory {os.path.join(WORKSPACE_DIR, apk_name)} is already used by {owner} in this batch: {path}"
+            }
+        else:
+            first_index.setdefault(real_path, i)
+
+    tasks = [asyncio.create_task(_one(i, apk_paths[i])) for i in first_index.values()]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            index, result = await fut
+            results[index] = result
+            if fail_fast and not result.get("success"):
+                logger.warning(f"Decode of {apk_paths[index]} failed, cancelling remaining batch")
+                break
+    finally:
+        # Cancelling finished tasks is a no-op; pending ones stop their apktool child
+        for task in tasks:
+            task.cancel()
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+
+    for outcome in outcomes:
+        if isinstance(outcome, tuple):
+            index, result = outcome
+            results[index] = result
+    for index, path in enumerate(apk_paths):
+        first = first_index.get(os.path.abspath(path))
+        if first is not None and first != index:
+            results[index] = results[first]
+    for index, result in enumerate(results):
+        if result is None:
+            results[index] = {
+                "success": False,
+                "cancelled": True,
+                "error": f"Cancelled after an earlier failure: {apk_paths[index]}"
+            }
+
+    succeeded = sum(1 for r in results if r.get("success"))
+    return {
+        "success": succeeded == len(results),
+        "results": results,
+        "count": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded
+    }
+
 @mcp.tool(name="build_apk", description="Build an APK file from a decoded APKTool project.")
 @supabase_logger
 async def build_apk(project_dir: str, output_apk: Optional[str] = None, debug: bool = True, force_all: bool = False) -> Dict:
@@ -168,23 +834,24 @@ async def build_apk(project_dir: str, output_apk: Optional[str] = None, debug: b
             "error": f"Project directory not found: {project_dir}"
         }
     
-    command = ["apktool", "b", project_dir]
+    # Absolute paths, since a reused Nailgun JVM resolves relative ones against its own working directory
+    command = ["b", os.path.abspath(project_dir)]
 
     if debug:
         command.append("-d")
     if force_all:
         command.append("-f")
     if output_apk:
-        command.extend(["-o", output_apk])
+        command.extend(["-o", os.path.abspath(output_apk)])
 
-    result = run_command(command)
+    result = await run_apktool(command)
 
     if result["success"]:
         # Determine built APK path if not specified
         if not output_apk:
             output_apk = os.path.join(project_dir, "dist", os.path.basename(project_dir) + ".apk")
 
-        if os.path.exists(output_apk):
+        if os.path.isfile(output_apk):
             result["apk_path"] = output_apk
         else:
             result["warning"] = f"Build succeeded but APK not found at expected path: {output_apk}"
@@ -206,20 +873,18 @@ async def get_manifest(project_dir: str) -> Dict:
     
     manifest_path = os.path.join(project_dir, "AndroidManifest.xml")
 
-    if not os.path.exists(manifest_path):
-        return {
-            "success": False, 
-            "error": f"AndroidManifest.xml not found in {project_dir}"
-        }
-
     try:
-        with open(manifest_path, 'r', encoding="utf-8") as f:
-            content = f.read()
+        content = await asyncio.to_thread(read_text_file_cached, manifest_path)
         return {
             "success": True, 
             "manifest": content, 
             "path": manifest_path
         }
+    except FileNotFoundError:
+        return {
+            "success": False, 
+            "error": f"AndroidManifest.xml not found in {project_dir}"
+        }
     except Exception as e:
         logger.error(f"Error reading manifest: {str(e)}")
         return {
@@ -242,20 +907,18 @@ async def get_apktool_yml(project_dir: str) -> Dict:
 
     yml_path = os.path.join(project_dir, "apktool.yml")
 
-    if not os.path.exists(yml_path):
-        return {
-            "success": False, 
-            "error": f"apktool.yml not found in {project_dir}"
-        }
-
     try:
-        with open(yml_path, 'r', encoding="utf-8") as f:
-            content = f.read()
+        content = await asyncio.to_thread(read_text_file_cached, yml_path)
         return {
             "success": True,
             "content": content,
             "path": yml_path
         }
+    except FileNotFoundError:
+        return {
+            "success": False, 
+            "error": f"apktool.yml not found in {project_dir}"
+        }
     except Exception as e:
         logger.error(f"Error reading apktool.yml: {str(e)}")
         return {
@@ -283,9 +946,7 @@ async def list_smali_directories(project_dir: str) -> Dict:
         }
     
     try:
-        smali_dirs = [d for d in os.listdir(project_dir) 
-                      if d.startswith("smali") 
-                      and os.path.isdir(os.path.join(project_dir, d))]
+        smali_dirs = await asyncio.to_thread(list_smali_dirs, project_dir)
         
         return {
             "success": True,
@@ -316,10 +977,8 @@ async def list_smali_files(project_dir: str, smali_dir: str = "smali", package_p
 
     smali_path = os.path.join(project_dir, smali_dir)
 
-    if not os.path.exists(smali_path):
-        smali_dirs = [d for d in os.listdir(project_dir)
-                     if d.startswith("smali") 
-                     and os.path.isdir(os.path.join(project_dir, d))]
+    if not await asyncio.to_thread(os.path.exists, smali_path):
+        smali_dirs = await asyncio.to_thread(list_smali_dirs, project_dir)
         return {
             "success": False,
             "error": f"Smali directory not found: {smali_path}",
@@ -333,7 +992,7 @@ async def list_smali_files(project_dir: str, smali_dir: str = "smali", package_p
         if package_prefix:
             # If package prefix is given, convert it to directory path
             package_path = os.path.join(smali_path, package_prefix.replace('.', os.path.sep))
-            if not os.path.exists(package_path):
+            if not await asyncio.to_thread(os.path.exists, package_path):
                 return {
                     "success": False,
                     "error": f"Package not found: {package_prefix}",
@@ -343,19 +1002,17 @@ async def list_smali_files(project_dir: str, smali_dir: str = "smali", package_p
         else:
             root_dir = smali_path
         
-        # Recursively find all .smali files
-        for root, _, files in os.walk(root_dir):
-            for file in files:
-                if file.endswith(".smali"):
-                    file_path = os.path.join(root, file)
-                    rel_path = os.path.relpath(file_path, smali_path)
-                    class_name = rel_path.replace(os.path.sep, '.').replace('.smali', '')
-
-                    smali_files.append({
-                        "class_name": class_name,
-                        "file_path": file_path,
-                        "rel_path": rel_path
-                    })
+        # Recursively find all .smali files off the event loop, one worker per top-level package
+        prefix_len = len(os.path.join(smali_path, ""))
+        for file_path in await asyncio.to_thread(find_smali_files, root_dir):
+            rel_path = file_path[prefix_len:]
+            class_name = rel_path[:-len(".smali")].replace(os.path.sep, '.')
+
+            smali_files.append({
+                "class_name": class_name,
+                "file_path": file_path,
+                "rel_path": rel_path
+            })
 
         # Sort by class name
         smali_files.sort(key=lambda x: x["class_name"])
@@ -395,22 +1052,27 @@ async def get_smali_file(project_dir: str, class_name: str) -> Dict:
         }
     
     try:
+        indexed = (await asyncio.to_thread(smali_class_index, project_dir)).get(class_name)
+        if indexed:
+            file_path, smali_dir = indexed
+            content = await asyncio.to_thread(read_text_file_if_exists, file_path)
+            if content is not None:
+                return {
+                    "success": True,
+                    "content": content,
+                    "file_path": file_path,
+                    "smali_dir": smali_dir
+                }
+
         # Look for the class in all smali directories
-        smali_dirs = [d for d in os.listdir(project_dir)
-                      if d.startswith("smali")
-                      and os.path.isdir(os.path.join(project_dir, d))]
+        smali_dirs = await asyncio.to_thread(list_smali_dirs, project_dir)
 
+        class_file = class_name.replace('.', os.sep) + '.smali'
         for smali_dir in smali_dirs:
-            file_path = os.path.join(
-                project_dir, 
-                smali_dir, 
-                class_name.replace('.', os.path.sep) + '.smali'
-            )
-
-            if os.path.exists(file_path):
-                with open(file_path, 'r', encoding="utf-8") as f:
-                    content = f.read()
+            file_path = f"{project_dir}{os.sep}{smali_dir}{os.sep}{class_file}"
 
+            content = await asyncio.to_thread(read_text_file_if_exists, file_path)
+            if content is not None:
                 return {
                     "success": True,
                     "content": content,
@@ -453,21 +1115,13 @@ async def modify_smali_file(project_dir: str, class_name: str, new_content: str,
         }
     
     try:
-        # Look for the class in all smali directories
-        smali_dirs = [d for d in os.listdir(project_dir)
-                      if d.startswith("smali")
-                      and os.path.isdir(os.path.join(project_dir, d))]
-
         file_path = None
-        for smali_dir in smali_dirs:
-            test_path = os.path.join(
-                project_dir,
-                smali_dir,
-                class_name.replace('.', os.path.sep) + '.smali'
-                )
-            if os.path.exists(test_path):
-                file_path = test_path
-                break
+        indexed = (await asyncio.to_thread(smali_class_index, project_dir)).get(class_name)
+        if indexed and await asyncio.to_thread(os.path.isfile, indexed[0]):
+            file_path = indexed[0]
+        else:
+            # Look for the class in all smali directories
+            smali_dirs, file_path = await asyncio.to_thread(find_smali_class_file, project_dir, class_name)
 
         if not file_path:
             return {
@@ -476,15 +1130,28 @@ async def modify_smali_file(project_dir: str, class_name: str, new_content: str,
                 "searched_dirs": smali_dirs
             }
         
+        # Nothing to back up or write if the file already has this content
+        data = new_content.encode("utf-8")
+        if await asyncio.to_thread(file_has_content, file_path, data):
+            return {
+                "success": True,
+                "message": f"No changes needed for {file_path}",
+                "file_path": file_path,
+                "backup_path": None,
+                "unchanged": True
+            }
+
+        # An edited project no longer matches its APK, so the next decode must not reuse it
+        await asyncio.to_thread(clear_decode_stamp, project_dir)
+
         # Create backup if requested
         backup_path = None
         if create_backup:
             backup_path = file_path + ".bak"
-            shutil.copy2(file_path, backup_path)
+            await asyncio.to_thread(backup_file, file_path, backup_path)
         
         # Write new content
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(new_content)
+        await asyncio.to_thread(write_file_atomic, file_path, data)
         
         return {
             "success": True,
@@ -515,7 +1182,7 @@ async def list_resources(project_dir: str, resource_type: Optional[str] = None)
 
     res_path = os.path.join(project_dir, "res")
 
-    if not os.path.exists(res_path):
+    if not await asyncio.to_thread(os.path.exists, res_path):
         return {
             "success": False,
             "error": f"Resources directory not found: {res_path}"
@@ -525,26 +1192,15 @@ async def list_resources(project_dir: str, resource_type: Optional[str] = None)
         if resource_type:
             # List resources of specific type
             type_path = os.path.join(res_path, resource_type)
-            if not os.path.exists(type_path):
-                resource_types = [
-                    d for d in os.listdir(res_path) 
-                    if os.path.isdir(os.path.join(res_path, d))
-                ]
+            if not await asyncio.to_thread(os.path.exists, type_path):
+                resource_types = await asyncio.to_thread(list_resource_type_names, res_path)
                 return {
                     "success": False,
                     "error": f"Resource type directory not found: {resource_type}",
                     "available_types": resource_types
                 }
 
-            resources = []
-            for item in os.listdir(type_path):
-                item_path = os.path.join(type_path, item)
-                if os.path.isfile(item_path):
-                    resources.append({
-                        "name": item,
-                        "path": item_path,
-                        "size": os.path.getsize(item_path)
-                    })
+            resources = await asyncio.to_thread(list_resource_files, type_path)
             
             return {
                 "success": True,
@@ -554,19 +1210,7 @@ async def list_resources(project_dir: str, resource_type: Optional[str] = None)
             }
         else:
             # List all resource types
-            resource_types = []
-            for item in os.listdir(res_path):
-                type_path = os.path.join(res_path, item)
-                if os.path.isdir(type_path):
-                    resource_count = len([
-                        f for f in os.listdir(type_path) 
-                        if os.path.isfile(os.path.join(type_path, f))
-                    ])
-                    resource_types.append({
-                        "type": item,
-                        "path": type_path,
-                        "count": resource_count
-                    })
+            resource_types = await asyncio.to_thread(list_resource_types, res_path)
             
             return {
                 "success": True,
@@ -597,21 +1241,22 @@ async def get_resource_file(project_dir: str, resource_type: str, resource_name:
 
     resource_path = os.path.join(project_dir, "res", resource_type, resource_name)
 
-    if not os.path.exists(resource_path):
-        return {
-            "success": False,
-            "error": f"Resource file not found: {resource_path}"
-        }
-    
+    size = None
     try:
-        with open(resource_path, 'r', encoding="utf-8") as f:
-            content = f.read()
+        st = await asyncio.to_thread(os.stat, resource_path)
+        size = st.st_size
+        content = await asyncio.to_thread(read_text_file_cached, resource_path, read_resource_text, st)
         
         return {
             "success": True,
             "content": content,
             "path": resource_path,
-            "size": os.path.getsize(resource_path)
+            "size": size
+        }
+    except FileNotFoundError:
+        return {
+            "success": False,
+            "error": f"Resource file not found: {resource_path}"
         }
     except UnicodeDecodeError:
         # This might be a binary resource
@@ -619,7 +1264,7 @@ async def get_resource_file(project_dir: str, resource_type: str, resource_name:
             "success": False,
             "error": "This appears to be a binary resource file and cannot be read as text",
             "path": resource_path,
-            "size": os.path.getsize(resource_path),
+            "size": size,
             "is_binary": True
         }
     except Exception as e:
@@ -648,22 +1293,35 @@ async def modify_resource_file(project_dir: str, resource_type: str, resource_na
 
     resource_path = os.path.join(project_dir, "res", resource_type, resource_name)
 
-    if not os.path.exists(resource_path):
+    if not os.path.isfile(resource_path):
         return {
             "success": False,
             "error": f"Resource file not found: {resource_path}"
         }
 
     try:
+        # nothing to back up or write if the file already has this content
+        data = new_content.encode("utf-8")
+        if await asyncio.to_thread(file_has_content, resource_path, data):
+            return {
+                "success": True,
+                "message": f"No changes needed for {resource_path}",
+                "path": resource_path,
+                "backup_path": None,
+                "unchanged": True
+            }
+
+        # An edited project no longer matches its APK, so the next decode must not reuse it
+        await asyncio.to_thread(clear_decode_stamp, project_dir)
+
         # create backup if requested
         backup_path = None
         if create_backup:
             backup_path = resource_path + ".bak"
-            shutil.copy2(resource_path, backup_path)
+            await asyncio.to_thread(backup_file, resource_path, backup_path)
         
         # write new content
-        with open(resource_path, 'w', encoding="utf-8") as f:
-            f.write(new_content)
+        await asyncio.to_thread(write_file_atomic, resource_path, data)
         
         return {
             "success": True,
@@ -680,7 +1338,7 @@ async def modify_resource_file(project_dir: str, resource_type: str, resource_na
     
 @mcp.tool(name="search_in_files", description="Search for a pattern in files specified extensions.")
 @supabase_logger
-async def search_in_files(project_dir: str, search_pattern: str, file_extensions: List[str] = [".smali", ".xml"], max_results: int = 100) -> Dict:
+async def search_in_files(project_dir: str, search_pattern: str, file_extensions: List[str] = [".smali", ".xml"], max_results: int = 100, regex: bool = False) -> Dict:
     """
     Search for a pattern in files with specified extensions.
 
@@ -689,6 +1347,7 @@ async def search_in_files(project_dir: str, search_pattern: str, file_extensions
         search_pattern: Text pattern to search for
         file_extensions: List of file extensions to search in
         max_results: Maximum number of results to return
+        regex: Treat search_pattern as a regular expression (multiline, Unicode semantics) matched against the decoded file text instead of literal text
     
     Returns:
         Dictionary with search results
@@ -700,30 +1359,20 @@ async def search_in_files(project_dir: str, search_pattern: str, file_extensions
             "error": f"Project directory not found: {project_dir}"
         }
     
+    # Compile or encode the pattern once; every worker thread shares it
+    if regex:
+        try:
+            needle = re.compile(search_pattern, re.MULTILINE)
+        except re.error as e:
+            return {
+                "success": False,
+                "error": f"Invalid regular expression: {str(e)}"
+            }
+    else:
+        needle = search_pattern.encode("utf-8")
+
     try:
-        results = []
-
-        for root, _, files in os.walk(project_dir):
-            for file in files:
-                if len(results) >= max_results:
-                    break
-
-                if any(file.endswith(ext) for ext in file_extensions):
-                    file_path = os.path.join(root, file)
-                    try:
-                        with open(file_path, 'r', encoding="utf-8") as f:
-                            content = f.read()
-                            if search_pattern in content:
-                                rel_path = os.path.relpath(file_path, project_dir)
-                                results.append({
-                                    "file": rel_path,
-                                    "path": file_path
-                                })
-                    except UnicodeDecodeError:
-                        # Skip binary files
-                        pass
-                    except Exception as e:
-                        logger.error(f"Error reading file {file_path}: {str(e)}")
+        results = await asyncio.to_thread(search_files, project_dir, needle, file_extensions, max_results)
         
         return {
             "success": True,
@@ -753,7 +1402,6 @@ async def clean_project(project_dir: str, backup: bool = True) -> Dict:
     Returns:
         Dictionary with operation results
     """
-    import time
     if not os.path.exists(project_dir):
         return {
             "success": False,
@@ -767,19 +1415,21 @@ async def clean_project(project_dir: str, backup: bool = True) -> Dict:
         
         for dir_name in dirs_to_clean:
             dir_path = os.path.join(project_dir, dir_name)
-            if os.path.exists(dir_path):
+            try:
                 if backup:
-                    # Create backup
+                    # Renaming the directory aside is both the backup and the clean
                     backup_path = f"{dir_path}_backup_{int(time.time())}"
-                    shutil.copytree(dir_path, backup_path)
+                    os.rename(dir_path, backup_path)
                     backed_up.append({
                         "original": dir_path,
                         "backup": backup_path
                     })
-                
-                # Remove directory
-                shutil.rmtree(dir_path)
-                cleaned.append(dir_path)
+                else:
+                    await asyncio.to_thread(shutil.rmtree, dir_path)
+            except FileNotFoundError:
+                # Nothing to clean
+                continue
+            cleaned.append(dir_path)
         
         return {
             "success": True,
@@ -1,17 +1,39 @@
 import os
 import json
+import time
+import queue
+import atexit
 import logging
-from typing import Any, Dict, Optional
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 from supabase import create_client, Client
 
-logger = logging.getLogger(__name__)
+try:
+    import orjson
+except ImportError:  # optional; the stdlib json module is used without it
+    orjson = None
+
+logger = logging.getLogger("apktool_mcp_server.supabase")
 
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 SUPABASE_TABLE = os.environ.get("SUPABASE_TABLE", "apktool_logs")
+# Rows are sent in batches of up to LOG_BATCH_SIZE, at least every LOG_FLUSH_INTERVAL seconds
+LOG_BATCH_SIZE = int(os.environ.get("SUPABASE_LOG_BATCH_SIZE", "64"))
+LOG_FLUSH_INTERVAL = float(os.environ.get("SUPABASE_LOG_FLUSH_INTERVAL", "2"))
+# At most LOG_QUEUE_SIZE rows wait for the worker; further rows are dropped while Supabase is slow or down
+LOG_QUEUE_SIZE = int(os.environ.get("SUPABASE_LOG_QUEUE_SIZE", "1000"))
+# Set when the params/result columns are jsonb, so values are sent as-is instead of as JSON text
+SUPABASE_JSONB = os.environ.get("SUPABASE_JSONB", "0") == "1"
+# Successful results encoding to more than this many bytes are logged as a summary (0 = no limit)
+SUPABASE_MAX_RESULT_BYTES = int(os.environ.get("SUPABASE_MAX_RESULT_BYTES", "32000"))
 
 supabase: Optional[Client] = None
 
+# Pending (tool_name, params, result) records; None tells the worker to stop
+_log_queue: "queue.Queue[Optional[Tuple[str, Dict[str, Any], Dict[str, Any]]]]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+_log_thread: Optional[threading.Thread] = None
+
 
 def init_supabase() -> Optional[Client]:
     """Initialize the Supabase client using environment variables."""
@@ -19,6 +41,7 @@ def init_supabase() -> Optional[Client]:
     if SUPABASE_URL and SUPABASE_KEY:
         try:
             supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+            _start_log_worker()
             logger.info("Supabase client initialized")
         except Exception as e:
             logger.error(f"Failed to initialize Supabase client: {e}")
@@ -29,17 +52,119 @@ def init_supabase() -> Optional[Client]:
 
 
 def log_result(tool_name: str, params: Dict[str, Any], result: Dict[str, Any]) -> None:
-    """Log the tool invocation result to Supabase if configured."""
+    """Queue the tool invocation result for logging to Supabase if configured."""
     if supabase is None:
         return
     try:
-        supabase.table(SUPABASE_TABLE).insert({
-            "tool": tool_name,
-            "params": json.dumps(params),
-            "result": json.dumps(result),
-            "success": bool(result.get("success"))
-        }).execute()
+        _log_queue.put_nowait((tool_name, params, result))
+    except queue.Full:
+        logger.warning(f"Supabase log queue is full, dropping result of {tool_name}")
+
+
+def flush_logs(timeout: float = 10) -> None:
+    """Send any queued results and stop the background logging thread."""
+    global _log_thread
+    if _log_thread is None:
+        return
+    try:
+        _log_queue.put(None, timeout=timeout)
+    except queue.Full:
+        logger.warning("Supabase log queue is still full, abandoning pending results")
+    else:
+        _log_thread.join(timeout)
+    _log_thread = None
+
+
+def _start_log_worker() -> None:
+    """Start the daemon thread that batches queued results into Supabase inserts."""
+    global _log_thread
+    if _log_thread is not None:
+        return
+    _log_thread = threading.Thread(target=_log_worker, name="supabase-log", daemon=True)
+    _log_thread.start()
+    atexit.register(flush_logs)
+
+
+def _log_worker() -> None:
+    """Collect queued results into batches and insert each batch in one request."""
+    while True:
+        record = _log_queue.get()
+        if record is None:
+            return
+        batch = [record]
+        stopping = False
+        deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+        while len(batch) < LOG_BATCH_SIZE:
+            try:
+                record = _log_queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if record is None:
+                stopping = True
+                break
+            batch.append(record)
+        _insert_batch(batch)
+        if stopping:
+            return
+
+
+def _dumps_bytes(value: Any) -> bytes:
+    """Serialize a value to UTF-8 JSON, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    # Match orjson's output so sizes don't depend on which encoder is installed
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+def _dumps(value: Any) -> str:
+    """Serialize a value to JSON text, using orjson when it is installed."""
+    return _dumps_bytes(value).decode("utf-8")
+
+
+def _build_row(tool_name: str, params: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the table row for one result, summarizing large successful results."""
+    success = result.get("success")
+    encoded_result = None
+    # Failures are always logged in full, they are the ones worth debugging
+    if SUPABASE_MAX_RESULT_BYTES and success is not False:
+        encoded_result = _dumps_bytes(result)
+        if len(encoded_result) > SUPABASE_MAX_RESULT_BYTES:
+            result = {
+                "success": success,
+                "truncated": True,
+                "size": len(encoded_result),
+                "keys": sorted(result)
+            }
+            encoded_result = None
+    if SUPABASE_JSONB:
+        # jsonb columns take the values directly instead of JSON text
+        params_value, result_value = params, result
+    else:
+        if encoded_result is None:
+            encoded_result = _dumps_bytes(result)
+        params_value, result_value = _dumps(params), encoded_result.decode("utf-8")
+    return {
+        "tool": tool_name,
+        "params": params_value,
+        "result": result_value,
+        "success": bool(success)
+    }
+
+
+def _insert_batch(batch: List[Tuple[str, Dict[str, Any], Dict[str, Any]]]) -> None:
+    """Insert a batch of results, skipping any that can't be serialized."""
+    rows = []
+    for tool_name, params, result in batch:
+        try:
+            rows.append(_build_row(tool_name, params, result))
+        except (TypeError, ValueError) as e:
+            logger.error(f"Failed to serialize {tool_name} result for Supabase: {e}")
+    if not rows:
+        return
+    try:
+        # returning="minimal": don't have PostgREST echo the inserted rows (and their results) back
+        supabase.table(SUPABASE_TABLE).insert(rows, returning="minimal").execute()
     except Exception as e:
-        logger.error(f"Failed to log result to Supabase: {e}")
+        logger.error(f"Failed to log {len(rows)} result(s) to Supabase: {e}")
 
 